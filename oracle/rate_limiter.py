@@ -0,0 +1,72 @@
+"""
+Request and token rate limiting for OpenAI API calls
+
+Follows the openai-cookbook parallel processor pattern: capacity for requests
+and tokens per minute refills continuously, and a request waits until both
+budgets can cover it instead of being sent and retried after a 429.
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket over requests-per-minute and tokens-per-minute
+    
+    Each acquire() consumes one request and the estimated tokens of the call.
+    Waiters are served in arrival order, so a large request cannot be starved
+    by a stream of small ones.
+    """
+    
+    def __init__(self, max_requests_per_minute: float, max_tokens_per_minute: float):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        
+        # Buckets start full so a fresh process can burst up to one minute's quota
+        self.available_request_capacity = max_requests_per_minute
+        self.available_token_capacity = max_tokens_per_minute
+        self._last_update = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        """Add the capacity accrued since the last update, capped at one minute's quota"""
+        now = time.monotonic()
+        elapsed = now - self._last_update
+        self._last_update = now
+        
+        self.available_request_capacity = min(
+            self.available_request_capacity + self.max_requests_per_minute * elapsed / 60,
+            self.max_requests_per_minute
+        )
+        self.available_token_capacity = min(
+            self.available_token_capacity + self.max_tokens_per_minute * elapsed / 60,
+            self.max_tokens_per_minute
+        )
+    
+    async def acquire(self, estimated_tokens: int = 0):
+        """Wait until one request and estimated_tokens fit in the current budget, then consume them"""
+        # A single call larger than the whole bucket would never fit
+        tokens = min(estimated_tokens, self.max_tokens_per_minute)
+        
+        async with self._lock:
+            while True:
+                self._refill()
+                request_deficit = 1 - self.available_request_capacity
+                token_deficit = tokens - self.available_token_capacity
+                
+                if request_deficit <= 0 and token_deficit <= 0:
+                    self.available_request_capacity -= 1
+                    self.available_token_capacity -= tokens
+                    return
+                
+                # Sleep until the scarcer budget has refilled enough
+                wait = max(
+                    request_deficit * 60 / self.max_requests_per_minute,
+                    token_deficit * 60 / self.max_tokens_per_minute
+                )
+                logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+                await asyncio.sleep(wait)